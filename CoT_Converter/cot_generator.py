@@ -1,33 +1,74 @@
-from .utils import sanitize_filename, get_current_time, get_stale_time
-from .kml_parser import NAMESPACES, extract_coordinates, extract_polygon_coordinates, calculate_centroid
+from .utils import get_current_time, get_stale_time
+from .kml_parser import extract_coordinates, extract_polygon_coordinates, calculate_centroid, find_child
+from .kml_parser import KML_NAME, KML_STYLE_URL, KML_LINE_STYLE, KML_POLY_STYLE, KML_COLOR, KML_WIDTH
+from .kml_parser import KML_POINT, KML_POLYGON, KML_LINESTRING, KML_STYLE, KML_STYLE_MAP, KML_PAIR, KML_KEY
+import io
 import os
+import html
+import json
 import uuid
+import tarfile
+import time
+import zipfile
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from lxml import etree
+
+# Number of threads used to write CoT files; writing is I/O bound
+WRITER_THREADS = 8
+
+# Writes queued per writer thread; bounds the encoded events held in memory
+WRITES_IN_FLIGHT = 4
+
+# Placemarks sent to a worker process per task when converting in parallel
+WORKER_CHUNKSIZE = 64
+
+# Chunks queued per worker process; bounds the serialized placemarks held in memory
+CHUNKS_IN_FLIGHT = 4
+
+# Sidecar file in a CoT output directory mapping each file's UID to its callsign,
+# one JSON object per line; data_package_gen reads it instead of re-parsing the files
+INDEX_FILENAME = "_index.jsonl"
+
+# Output paths with these extensions are written as a single archive
+ARCHIVE_EXTENSIONS = ('.zip', '.tar')
+
+# Write buffer for bundle output, so many small events become few large writes
+BUNDLE_BUFFER_SIZE = 512 * 1024
 
 def generate_uid():
     """Generate a unique identifier for CoT events."""
     return str(uuid.uuid4())
 
+def generate_file_uid():
+    """Generate a unique identifier for naming a CoT file.
+
+    The hex form only contains ``[0-9a-f]``, so it is always safe to use as a
+    file name without sanitizing it.
+    """
+    return uuid.uuid4().hex
+
+def generate_uids(n):
+    """Generate ``n`` random (version 4) identifiers from a single urandom read."""
+    buf = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=buf[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
 def convert_kml_color_to_cot(kml_color):
     """Convert KML AABBGGRR color to COT ARGB format."""
     try:
-        if not kml_color or len(kml_color) != 8:
+        # int() also accepts signs, underscores and whitespace; only plain hex digits are valid here
+        if not kml_color or len(kml_color) != 8 or not (kml_color.isascii() and kml_color.isalnum()):
             raise ValueError("Invalid color format")
-            
-        if not all(c in '0123456789ABCDEFabcdef' for c in kml_color):
-            raise ValueError("Invalid hex characters")
-        
-        # KML format: AABBGGRR -> COT format: AARRGGBB
-        aa = kml_color[0:2]  # Alpha
-        bb = kml_color[2:4]  # Blue
-        gg = kml_color[4:6]  # Green  
-        rr = kml_color[6:8]  # Red
-        
-        cot_color = aa + rr + gg + bb
-        return str(int(cot_color, 16) - 2**32)  # Convert to signed integer
+        value = int(kml_color, 16)  # 0xAABBGGRR
     except (ValueError, TypeError) as e:
         print(f"Warning: Invalid color value '{kml_color}': {e}")
         return '-16777216'  # Default black
 
+    # KML format: AABBGGRR -> COT format: AARRGGBB (alpha and green stay put, red and blue swap)
+    argb = (value & 0xFF00FF00) | ((value & 0xFF) << 16) | ((value >> 16) & 0xFF)
+    return str(argb - (1 << 32) if argb & 0x80000000 else argb)  # Convert to signed integer
+
 def validate_coordinates(lat, lon, hae=None):
     """Validate coordinate values."""
     try:
@@ -46,14 +87,53 @@ def validate_coordinates(lat, lon, hae=None):
         print(f"Warning: Invalid coordinates (lat={lat}, lon={lon}): {e}")
         return False
 
-def extract_style_info(placemark, root):
-    """Extract style information from placemark."""
-    style_url = placemark.find('./kml:styleUrl', namespaces=NAMESPACES)
+def parse_styles(styles):
+    """Parse every Style element in a style id table once.
+
+    Returns a dict mapping style ids to the ``parse_style_element`` result,
+    so placemarks sharing a style do not parse it again. A StyleMap id maps
+    to the style of its ``normal`` pair; a StyleMap whose ``normal`` pair
+    cannot be resolved is left out, so placemarks fall back to inline styles.
+    """
+    style_cache = {style_id: parse_style_element(style_elem)
+                   for style_id, style_elem in styles.items() if style_elem.tag != KML_STYLE_MAP}
+    for style_id, style_elem in styles.items():
+        if style_elem.tag == KML_STYLE_MAP:
+            style_info = _parse_style_map(style_elem, style_cache)
+            if style_info is not None:
+                style_cache[style_id] = style_info
+    return style_cache
+
+def _parse_style_map(style_map, style_cache):
+    """Return the parsed style of a StyleMap's ``normal`` pair, or None."""
+    for pair in style_map.iterchildren(KML_PAIR):
+        key = find_child(pair, KML_KEY)
+        if key is None or (key.text or '').strip() != 'normal':
+            continue
+        style_url = find_child(pair, KML_STYLE_URL)
+        if style_url is not None and style_url.text:
+            return style_cache.get(style_url.text.strip().lstrip('#'))
+        inline_style = find_child(pair, KML_STYLE)
+        if inline_style is not None:
+            return parse_style_element(inline_style)
+    return None
+
+def extract_style_info(placemark, style_cache):
+    """Extract style information from placemark.
+
+    ``style_cache`` maps style ids to parsed style info, as returned by
+    ``parse_styles``, so resolving a ``styleUrl`` is a single dict lookup.
+    A placemark without a resolvable ``styleUrl`` falls back to its own
+    inline Style. The returned dict may be shared and must not be modified.
+    """
+    style_url = find_child(placemark, KML_STYLE_URL)
     if style_url is not None and style_url.text:
-        style_id = style_url.text.lstrip('#')
-        style_elem = root.find(f'.//kml:Style[@id="{style_id}"]', namespaces=NAMESPACES)
-        if style_elem is not None:
-            return parse_style_element(style_elem)
+        style_info = style_cache.get(style_url.text.lstrip('#'))
+        if style_info is not None:
+            return style_info
+    inline_style = find_child(placemark, KML_STYLE)
+    if inline_style is not None:
+        return parse_style_element(inline_style)
     return {}
 
 def parse_style_element(style_elem):
@@ -61,10 +141,10 @@ def parse_style_element(style_elem):
     style_info = {}
     
     # Line style
-    line_style = style_elem.find('./kml:LineStyle', namespaces=NAMESPACES)
+    line_style = find_child(style_elem, KML_LINE_STYLE)
     if line_style is not None:
-        color_elem = line_style.find('./kml:color', namespaces=NAMESPACES)
-        width_elem = line_style.find('./kml:width', namespaces=NAMESPACES)
+        color_elem = find_child(line_style, KML_COLOR)
+        width_elem = find_child(line_style, KML_WIDTH)
         
         if color_elem is not None:
             style_info['stroke_color'] = convert_kml_color_to_cot(color_elem.text)
@@ -72,104 +152,277 @@ def parse_style_element(style_elem):
             style_info['stroke_weight'] = width_elem.text
     
     # Polygon style
-    poly_style = style_elem.find('./kml:PolyStyle', namespaces=NAMESPACES)
+    poly_style = find_child(style_elem, KML_POLY_STYLE)
     if poly_style is not None:
-        color_elem = poly_style.find('./kml:color', namespaces=NAMESPACES)
+        color_elem = find_child(poly_style, KML_COLOR)
         if color_elem is not None:
             style_info['fill_color'] = convert_kml_color_to_cot(color_elem.text)
     
     return style_info
 
-def process_placemarks(placemarks, output_dir, prefix, debug=False):
-    """Enhanced placemark processing for multiple geometry types."""
-    for i, placemark in enumerate(placemarks):
-        placemark_name = placemark.find('./kml:name', namespaces=NAMESPACES)
-        if placemark_name is None or not placemark_name.text:
-            placemark_name = f"placemark_{i+1}"
-        else:
-            placemark_name = placemark_name.text
-
-        # Check for different geometry types
-        point_elem = placemark.find('.//kml:Point', namespaces=NAMESPACES)
-        polygon_elem = placemark.find('.//kml:Polygon', namespaces=NAMESPACES)
-        linestring_elem = placemark.find('.//kml:LineString', namespaces=NAMESPACES)
-        
-        cot_xml = None
-        uid = generate_uid()  # Generate a unique UID for the CoT file
-        
-        if polygon_elem is not None:
-            coords = extract_polygon_coordinates(polygon_elem)
-            if coords:
-                cot_xml = create_cot_polygon(placemark_name, coords, prefix)
-                
-        elif point_elem is not None:
-            coords = extract_coordinates(point_elem)
-            if coords:
-                cot_xml = create_cot_point(placemark_name, coords, prefix)
-                
-        elif linestring_elem is not None:
-            coords = extract_coordinates(linestring_elem)
-            if coords:
-                cot_xml = create_cot_linestring(placemark_name, coords, prefix)
-        
-        if cot_xml:
-            save_cot_file(cot_xml, output_dir, uid, placemark_name)
+def process_placemarks(placemarks, output_dir, prefix, debug=False, styles=None, workers=1, bundle=False):
+    """Enhanced placemark processing for multiple geometry types.
+
+    ``placemarks`` may be any iterable, including the streaming iterator
+    returned by ``parse_kml_file``; each placemark is only valid until the
+    next one is requested. ``styles`` is the style id table used to resolve
+    each placemark's ``styleUrl``. With ``workers`` > 1 placemarks are
+    converted in that many worker processes. If ``output_dir`` ends in
+    ``.zip`` or ``.tar`` every CoT file is stored in that one archive instead
+    of being written as a separate file. With ``bundle`` set, ``output_dir``
+    is a single file that receives every event as a length-prefixed record.
+    """
+    style_cache = parse_styles(styles or {})
+    # Every event in one batch shares the same time and stale stamps
+    times = (get_current_time(), get_stale_time(hours=24))
+    if workers > 1:
+        converted = _convert_in_processes(placemarks, prefix, style_cache, times, workers)
+    else:
+        converted = (_convert_placemark(placemark, i, prefix, style_cache, times)
+                     for i, placemark in enumerate(placemarks))
+
+    if bundle:
+        results = _save_to_bundle(converted, output_dir)
+    elif output_dir.lower().endswith(ARCHIVE_EXTENSIONS):
+        results = _save_to_archive(converted, output_dir)
+    else:
+        results = _save_to_directory(converted, output_dir)
+
+    # A bundle holds events rather than separate files
+    noun = "event" if bundle else "file"
+    created = 0
+    for output_file, placemark_name in results:
+        if output_file:
+            created += 1
+            if debug:
+                print(f"Created CoT {noun}: {output_file}")
         elif debug:
             print(f"Warning: No supported geometry found for placemark: {placemark_name}")
+    print(f"Created {created} CoT {noun}s in {output_dir}")
 
-def create_cot_point(name, coords, prefix, icon_type='a-u-G'):
-    """Create CoT XML for a point."""
-    lat, lon, hae = coords[0]
-    if not validate_coordinates(lat, lon, hae):
-        return None
-        
-    uid = generate_uid()
-    current_time = get_current_time()
-    stale_time = get_stale_time()
+def _convert_in_processes(placemarks, prefix, style_cache, times, workers):
+    """Convert placemarks across worker processes.
+
+    lxml elements cannot be pickled, so placemarks are sent to the workers
+    serialized and re-parsed there; the parsed style cache is plain data and
+    is sent as-is. Placemarks are sent in chunks of ``WORKER_CHUNKSIZE`` and
+    only a few chunks per worker are queued at a time, so the input is read
+    as results are consumed. Yields the same tuples as ``_convert_placemark``.
+    """
+    tasks = ((i, etree.tostring(placemark), prefix) for i, placemark in enumerate(placemarks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(style_cache, times)) as pool:
+        pending = deque()
+        while True:
+            chunk = list(islice(tasks, WORKER_CHUNKSIZE))
+            if not chunk:
+                break
+            pending.append(pool.submit(_convert_serialized_chunk, chunk))
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+_worker_style_cache = {}
+_worker_times = None
+
+def _init_worker(style_cache, times):
+    """Store the style cache and batch timestamps inside a worker process."""
+    global _worker_style_cache, _worker_times
+    _worker_style_cache = style_cache
+    _worker_times = times
+
+def _convert_serialized(task):
+    """Convert one serialized placemark inside a worker process."""
+    i, placemark_xml, prefix = task
+    return _convert_placemark(etree.fromstring(placemark_xml), i, prefix, _worker_style_cache, _worker_times)
+
+def _convert_serialized_chunk(chunk):
+    """Convert a list of serialized placemarks inside a worker process."""
+    return [_convert_serialized(task) for task in chunk]
+
+def _save_to_directory(converted, output_dir):
+    """Write converted placemarks as individual files from a thread pool.
+
+    Each file is recorded in the ``INDEX_FILENAME`` sidecar once its write
+    has succeeded; the sidecar is rewritten on every run, and files it does
+    not list are still scanned by data_package_gen. Only a few writes per
+    thread are queued at a time, so encoded events do not pile up when
+    conversion outpaces the disk. Yields ``(output_file, placemark_name)``
+    per placemark, with ``output_file`` None when nothing was written.
+    """
+    pending = deque()
+    index_path = os.path.join(output_dir, INDEX_FILENAME)
+    # Open the directory once so each file is created relative to it
+    # instead of resolving the full path again, where the OS allows it
+    dir_fd = os.open(output_dir, os.O_RDONLY) if os.open in os.supports_dir_fd else None
+    try:
+        with ThreadPoolExecutor(max_workers=WRITER_THREADS) as writer, \
+                open(index_path, 'w', encoding='utf-8') as index:
+
+            def collect():
+                # Surface write errors from the worker threads as they happen
+                future, uid, placemark_name = pending.popleft()
+                if future is None:
+                    return None, placemark_name
+                output_file = future.result()
+                index.write(json.dumps({"uid": uid, "callsign": placemark_name}) + "\n")
+                return output_file, placemark_name
+
+            for cot_xml, uid, placemark_name in converted:
+                future = None
+                if cot_xml:
+                    future = writer.submit(save_cot_file, cot_xml, output_dir, uid, placemark_name, dir_fd)
+                pending.append((future, uid, placemark_name))
+                if len(pending) >= WRITER_THREADS * WRITES_IN_FLIGHT:
+                    yield collect()
+            while pending:
+                yield collect()
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+
+def _save_to_archive(converted, archive_path):
+    """Store converted placemarks as entries of a single zip or tar archive.
+
+    The archive is opened once and entries are stored uncompressed, which
+    avoids creating one file per placemark. Yields the same tuples as
+    ``_save_to_directory``.
+    """
+    if archive_path.lower().endswith('.tar'):
+        with tarfile.open(archive_path, 'w|') as archive:
+            for cot_xml, uid, placemark_name in converted:
+                if not cot_xml:
+                    yield None, placemark_name
+                    continue
+                info = tarfile.TarInfo(cot_filename(uid))
+                info.size = len(cot_xml)
+                # TarInfo dates entries to the epoch by default; stamp the write time as zip does
+                info.mtime = time.time()
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(cot_xml))
+                yield os.path.join(archive_path, info.name), placemark_name
+    else:
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
+            for cot_xml, uid, placemark_name in converted:
+                if not cot_xml:
+                    yield None, placemark_name
+                    continue
+                entry = cot_filename(uid)
+                archive.writestr(entry, cot_xml)
+                yield os.path.join(archive_path, entry), placemark_name
+
+def _save_to_bundle(converted, bundle_path):
+    """Write converted placemarks back to back into a single bundle file.
+
+    Each event is stored as a 4-byte big-endian length followed by its
+    encoded CoT XML. Yields the same tuples as ``_save_to_directory``, with
+    the bundle path and the record's byte offset in place of a file path.
+    """
+    offset = 0
+    with open(bundle_path, 'wb', buffering=BUNDLE_BUFFER_SIZE) as bundle:
+        for cot_xml, _, placemark_name in converted:
+            if not cot_xml:
+                yield None, placemark_name
+                continue
+            bundle.write(len(cot_xml).to_bytes(4, 'big'))
+            bundle.write(cot_xml)
+            yield f"{bundle_path} (offset {offset})", placemark_name
+            offset += 4 + len(cot_xml)
+
+def _convert_placemark(placemark, i, prefix, style_cache, times):
+    """Build the CoT XML for a single placemark.
+
+    ``times`` is the batch's ``(current_time, stale_time)`` pair. Returns
+    ``(cot_xml, uid, placemark_name)`` with ``cot_xml`` as encoded bytes, or
+    None when the placemark has no supported geometry.
+    """
+    name_elem = find_child(placemark, KML_NAME)
+    placemark_name = (name_elem is not None and name_elem.text) or f"placemark_{i+1}"
     
-    return f"""<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
-<event version='2.0' uid='{uid}' type='{icon_type}' time='{current_time}' start='{current_time}' stale='{stale_time}' how='h-g-i-g-o'>
+    cot_xml = None
+    uid = generate_file_uid()  # Generate a unique UID for the CoT file
+    style_info = extract_style_info(placemark, style_cache)
+    
+    geometry = _find_geometry(placemark)
+    if geometry is not None:
+        cot_xml = _GEOMETRY_HANDLERS[geometry.tag](geometry, placemark_name, prefix, style_info, times)
+    
+    return cot_xml, uid, placemark_name
+
+def _find_geometry(placemark):
+    """Return the geometry element to convert for a placemark, or None.
+
+    Walks the placemark's descendants once, covering MultiGeometry members.
+    A Polygon wins over a Point, and a Point over a LineString.
+    """
+    found = None
+    for elem in placemark.iter(KML_POLYGON, KML_POINT, KML_LINESTRING):
+        if elem.tag == KML_POLYGON:
+            return elem
+        if found is None or (elem.tag == KML_POINT and found.tag == KML_LINESTRING):
+            found = elem
+    return found
+
+def _convert_polygon(polygon_elem, name, prefix, style_info, times):
+    """Build the CoT event for a Polygon, or None if it has no coordinates."""
+    coords = extract_polygon_coordinates(polygon_elem)
+    if coords:
+        return create_cot_polygon(name, coords, prefix, style_info, *times)
+    return None
+
+def _convert_point(point_elem, name, prefix, style_info, times):
+    """Build the CoT event for a Point, or None if it has no coordinates."""
+    coords = extract_coordinates(point_elem)
+    if coords:
+        return create_cot_point(name, coords, prefix, 'a-u-G', *times)
+    return None
+
+def _convert_linestring(linestring_elem, name, prefix, style_info, times):
+    """Build the CoT event for a LineString, or None if it has no coordinates."""
+    coords = extract_coordinates(linestring_elem)
+    if coords:
+        return create_cot_linestring(name, coords, prefix, "", style_info, *times)
+    return None
+
+# Builds the CoT event for each supported geometry tag
+_GEOMETRY_HANDLERS = {
+    KML_POLYGON: _convert_polygon,
+    KML_POINT: _convert_point,
+    KML_LINESTRING: _convert_linestring,
+}
+
+# CoT event templates, built once at import and filled in with str.format.
+# Free-text values (names, remarks, KML widths) are passed through _escape first;
+# the numeric values and generated ids need no escaping.
+_LINK_POINT_TEMPLATE = '        <link point="%s,%s,%s"/>'
+_LINK_ROUTE_TEMPLATE = '        <link uid="%s" callsign="%s" type="%s" point="%s,%s,%s" remarks="" relation="c"/>'
+
+def _escape(value):
+    """Escape a value for use in a quoted attribute or element text of a template."""
+    return html.escape(str(value))
+
+_POINT_TEMPLATE = """<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
+<event version='2.0' uid='{uid}' type='{icon_type}' time='{time}' start='{time}' stale='{stale}' how='h-g-i-g-o'>
     <point lat='{lat}' lon='{lon}' hae='{hae}' ce='9999999.0' le='9999999.0' />
     <detail>
         <status readiness='true'/>
         <archive/>
         <contact callsign='{name}'/>
         <remarks></remarks>
-        <archive/>
         <color argb='-1'/>
         <precisionlocation altsrc='???'/>
         <usericon iconsetpath='COT_MAPPING_2525B/a-u/a-u-G'/>
     </detail>
 </event>"""
 
-def create_cot_polygon(name, coordinates, prefix):
-    """Create CoT XML for a polygon."""
-    if not coordinates:
-        return None
-    
-    # Calculate centroid for main point
-    centroid = calculate_centroid(coordinates)
-    if not centroid:
-        return None
-    
-    lat, lon, hae = centroid
-    uid = generate_uid()
-    current_time = get_current_time()
-    stale_time = get_stale_time(hours=24)  # 24 hour stale time for shapes
-    
-    # Build link points for polygon boundary
-    link_points = []
-    for coord in coordinates:
-        link_points.append(f'        <link point="{coord[0]},{coord[1]},{coord[2]}"/>')
-    
-    return f"""<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
-<event version='2.0' uid='{uid}' type='u-d-f' time='{current_time}' start='{current_time}' stale='{stale_time}' how='h-e'>
+_POLYGON_TEMPLATE = """<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
+<event version='2.0' uid='{uid}' type='u-d-f' time='{time}' start='{time}' stale='{stale}' how='h-e'>
     <point lat='{lat}' lon='{lon}' hae='{hae}' ce='9999999.0' le='9999999.0' />
     <detail>
-{chr(10).join(link_points)}
-        <strokeColor value='-1'/>
-        <strokeWeight value='4.0'/>
-        <fillColor value='-1761607681'/>
+{links}
+        <strokeColor value='{stroke_color}'/>
+        <strokeWeight value='{stroke_weight}'/>
+        <fillColor value='{fill_color}'/>
         <contact callsign='{name}'/>
         <remarks></remarks>
         <archive/>
@@ -179,35 +432,13 @@ def create_cot_polygon(name, coordinates, prefix):
     </detail>
 </event>"""
 
-def create_cot_linestring(name, coordinates, prefix, remarks=""):
-    """Create CoT XML for a LineString."""
-    if not coordinates:
-        return None
-
-    # Calculate the midpoint of the LineString for the main point
-    midpoint_index = len(coordinates) // 2
-    lat, lon, hae = coordinates[midpoint_index]
-    uid = generate_uid()
-    current_time = get_current_time()
-    stale_time = get_stale_time(hours=24)  # 24 hour stale time for shapes
-
-    # Build link points for the LineString path with proper attributes
-    link_points = []
-    for i, coord in enumerate(coordinates):
-        link_uid = generate_uid()
-        # First and last points are waypoints (b-m-p-w), middle points are checkpoints (b-m-p-c)
-        link_type = 'b-m-p-w' if i == 0 or i == len(coordinates) - 1 else 'b-m-p-c'
-        link_callsign = f'WP{i+1}' if i == 0 or i == len(coordinates) - 1 else ''
-        
-        link_points.append(f'        <link uid="{link_uid}" callsign="{link_callsign}" type="{link_type}" point="{coord[0]},{coord[1]},{coord[2]}" remarks="" relation="c"/>')
-
-    return f"""<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
-<event version='2.0' uid='{uid}' type='b-m-r' time='{current_time}' start='{current_time}' stale='{stale_time}' how='h-e'>
+_LINESTRING_TEMPLATE = """<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
+<event version='2.0' uid='{uid}' type='b-m-r' time='{time}' start='{time}' stale='{stale}' how='h-e'>
     <point lat='{lat}' lon='{lon}' hae='{hae}' ce='9999999.0' le='9999999.0' />
     <detail>
-{chr(10).join(link_points)}
-        <strokeColor value='-16777216'/>
-        <strokeWeight value='3.0'/>
+{links}
+        <strokeColor value='{stroke_color}'/>
+        <strokeWeight value='{stroke_weight}'/>
         <strokeStyle value='solid'/>
         <labels_on value='false'/>
         <__routeinfo>
@@ -220,31 +451,11 @@ def create_cot_linestring(name, coordinates, prefix, remarks=""):
     </detail>
 </event>"""
 
-def create_cot_rectangle(name, coordinates, prefix):
-    """Create CoT XML for a rectangle."""
-    if not coordinates or len(coordinates) < 4:
-        return None
-
-    # Calculate centroid for main point
-    centroid = calculate_centroid(coordinates)
-    if not centroid:
-        return None
-    
-    lat, lon, hae = centroid
-    uid = generate_uid()
-    current_time = get_current_time()
-    stale_time = get_stale_time(hours=24)  # 24 hour stale time for shapes
-
-    # Build link points for rectangle corners
-    link_points = []
-    for coord in coordinates[:4]:  # Use only first 4 points for rectangle
-        link_points.append(f'        <link point="{coord[0]},{coord[1]},{coord[2]}"/>')
-
-    return f"""<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
-<event version='2.0' uid='{uid}' type='u-d-r' time='{current_time}' start='{current_time}' stale='{stale_time}' how='h-e'>
+_RECTANGLE_TEMPLATE = """<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
+<event version='2.0' uid='{uid}' type='u-d-r' time='{time}' start='{time}' stale='{stale}' how='h-e'>
     <point lat='{lat}' lon='{lon}' hae='{hae}' ce='9999999.0' le='9999999.0' />
     <detail>
-{chr(10).join(link_points)}
+{links}
         <strokeColor value='-1'/>
         <strokeWeight value='3.0'/>
         <fillColor value='-1761607681'/>
@@ -257,31 +468,11 @@ def create_cot_rectangle(name, coordinates, prefix):
     </detail>
 </event>"""
 
-def create_cot_route(name, coordinates, checkpoints, prefix):
-    """Create CoT XML for a route with checkpoints."""
-    if not coordinates:
-        return None
-
-    uid = generate_uid()
-    current_time = get_current_time()
-    stale_time = get_stale_time(hours=24)
-
-    # Create link elements for each checkpoint
-    link_elements = []
-    for i, coord in enumerate(coordinates):
-        point_uid = generate_uid()
-        callsign = checkpoints.get(i, '')
-        point_type = 'b-m-p-w' if callsign else 'b-m-p-c'
-        link_elements.append(
-            f'        <link uid="{point_uid}" callsign="{callsign}" type="{point_type}" '
-            f'point="{coord[0]},{coord[1]},{coord[2]}" remarks="" relation="c"/>'
-        )
-
-    return f"""<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
-<event version='2.0' uid='{uid}' type='b-m-r' time='{current_time}' start='{current_time}' stale='{stale_time}' how='h-e'>
+_ROUTE_TEMPLATE = """<?xml version='1.0' encoding='UTF-8' standalone='yes'?>
+<event version='2.0' uid='{uid}' type='b-m-r' time='{time}' start='{time}' stale='{stale}' how='h-e'>
     <point lat='0.0' lon='0.0' hae='9999999.0' ce='9999999.0' le='9999999.0' />
     <detail>
-{chr(10).join(link_elements)}
+{links}
         <link_attr planningmethod='Infil' color='-1' method='Driving' prefix='CP' type='Vehicle' stroke='3' direction='Infil' routetype='Primary' order='Ascending Check Points'/>
         <strokeColor value='-1'/>
         <strokeWeight value='3.0'/>
@@ -296,13 +487,143 @@ def create_cot_route(name, coordinates, checkpoints, prefix):
     </detail>
 </event>"""
 
-def save_cot_file(cot_xml, output_dir, uid, callsign):
-    """Save CoT XML to a file using UID as the filename."""
-    safe_uid = sanitize_filename(uid)  # Ensure UID is safe for filenames
-    output_file = os.path.join(output_dir, f"{safe_uid}.cot")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(cot_xml)
-    print(f"Created CoT file: {output_file}")
+def create_cot_point(name, coords, prefix, icon_type='a-u-G', current_time=None, stale_time=None):
+    """Create CoT XML for a point, encoded as UTF-8 bytes."""
+    lat, lon, hae = coords[0]
+    if not validate_coordinates(lat, lon, hae):
+        return None
+        
+    uid = generate_uid()
+    current_time = current_time or get_current_time()
+    stale_time = stale_time or get_stale_time()
+    
+    return _POINT_TEMPLATE.format(uid=uid, icon_type=icon_type, time=current_time, stale=stale_time,
+                                  lat=lat, lon=lon, hae=hae, name=_escape(name)).encode('utf-8')
+
+def create_cot_polygon(name, coordinates, prefix, style_info=None, current_time=None, stale_time=None):
+    """Create CoT XML for a polygon, encoded as UTF-8 bytes."""
+    if not coordinates:
+        return None
+    style_info = style_info or {}
+    
+    # Calculate centroid for main point
+    centroid = calculate_centroid(coordinates)
+    if not centroid:
+        return None
+    
+    lat, lon, hae = centroid
+    uid = generate_uid()
+    current_time = current_time or get_current_time()
+    stale_time = stale_time or get_stale_time(hours=24)  # 24 hour stale time for shapes
+    
+    # Build link points for polygon boundary
+    links = "\n".join(_LINK_POINT_TEMPLATE % (c[0], c[1], c[2]) for c in coordinates)
+    
+    return _POLYGON_TEMPLATE.format(
+        uid=uid, time=current_time, stale=stale_time, lat=lat, lon=lon, hae=hae, name=_escape(name),
+        links=links,
+        stroke_color=style_info.get('stroke_color', '-1'),
+        stroke_weight=_escape(style_info.get('stroke_weight', '4.0')),
+        fill_color=style_info.get('fill_color', '-1761607681')).encode('utf-8')
+
+def create_cot_linestring(name, coordinates, prefix, remarks="", style_info=None,
+                          current_time=None, stale_time=None):
+    """Create CoT XML for a LineString, encoded as UTF-8 bytes."""
+    if not coordinates:
+        return None
+    style_info = style_info or {}
+
+    # Calculate the midpoint of the LineString for the main point
+    midpoint_index = len(coordinates) // 2
+    lat, lon, hae = coordinates[midpoint_index]
+    uid = generate_uid()
+    current_time = current_time or get_current_time()
+    stale_time = stale_time or get_stale_time(hours=24)  # 24 hour stale time for shapes
+
+    # Build link points for the LineString path with proper attributes
+    # First and last points are waypoints (b-m-p-w), middle points are checkpoints (b-m-p-c)
+    last = len(coordinates) - 1
+    links = "\n".join(
+        _LINK_ROUTE_TEMPLATE % (link_uid, f'WP{i+1}', 'b-m-p-w', c[0], c[1], c[2]) if i == 0 or i == last
+        else _LINK_ROUTE_TEMPLATE % (link_uid, '', 'b-m-p-c', c[0], c[1], c[2])
+        for i, (link_uid, c) in enumerate(zip(generate_uids(len(coordinates)), coordinates))
+    )
+
+    return _LINESTRING_TEMPLATE.format(
+        uid=uid, time=current_time, stale=stale_time, lat=lat, lon=lon, hae=hae, name=_escape(name),
+        links=links, remarks=_escape(remarks),
+        stroke_color=style_info.get('stroke_color', '-16777216'),
+        stroke_weight=_escape(style_info.get('stroke_weight', '3.0'))).encode('utf-8')
+
+def create_cot_rectangle(name, coordinates, prefix, current_time=None, stale_time=None):
+    """Create CoT XML for a rectangle, encoded as UTF-8 bytes."""
+    if not coordinates or len(coordinates) < 4:
+        return None
+
+    # Calculate centroid for main point
+    centroid = calculate_centroid(coordinates)
+    if not centroid:
+        return None
+    
+    lat, lon, hae = centroid
+    uid = generate_uid()
+    current_time = current_time or get_current_time()
+    stale_time = stale_time or get_stale_time(hours=24)  # 24 hour stale time for shapes
+
+    # Build link points for rectangle corners (only the first 4 points are used)
+    links = "\n".join(_LINK_POINT_TEMPLATE % (c[0], c[1], c[2]) for c in coordinates[:4])
+
+    return _RECTANGLE_TEMPLATE.format(uid=uid, time=current_time, stale=stale_time, lat=lat, lon=lon, hae=hae,
+                                      name=_escape(name), links=links).encode('utf-8')
+
+def create_cot_route(name, coordinates, checkpoints, prefix, current_time=None, stale_time=None):
+    """Create CoT XML for a route with checkpoints, encoded as UTF-8 bytes."""
+    if not coordinates:
+        return None
+
+    uid = generate_uid()
+    current_time = current_time or get_current_time()
+    stale_time = stale_time or get_stale_time(hours=24)
+
+    # Create link elements for each checkpoint
+    links = "\n".join(
+        _LINK_ROUTE_TEMPLATE % (link_uid, _escape(checkpoints.get(i, '')),
+                                'b-m-p-w' if checkpoints.get(i) else 'b-m-p-c', c[0], c[1], c[2])
+        for i, (link_uid, c) in enumerate(zip(generate_uids(len(coordinates)), coordinates))
+    )
+
+    return _ROUTE_TEMPLATE.format(uid=uid, time=current_time, stale=stale_time, name=_escape(name),
+                                  links=links).encode('utf-8')
+
+def cot_filename(uid):
+    """Return the file name used for the CoT event saved under ``uid``.
+
+    ``uid`` must already be safe for file names, as ``generate_file_uid`` is.
+    """
+    return f"{uid}.cot"
+
+def save_cot_file(cot_xml, output_dir, uid, callsign, dir_fd=None):
+    """Save CoT XML to a file using UID as the filename.
+
+    ``cot_xml`` is the encoded bytes returned by the ``create_cot_*``
+    builders, written as-is. If ``dir_fd`` is an open descriptor for
+    ``output_dir`` the file is created relative to it. Returns the path of
+    the created file.
+    """
+    filename = cot_filename(uid)
+    output_file = os.path.join(output_dir, filename)
+    data = memoryview(cot_xml)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    if dir_fd is None:
+        fd = os.open(output_file, flags, 0o644)
+    else:
+        fd = os.open(filename, flags, 0o644, dir_fd=dir_fd)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+    return output_file
 
 if __name__ == "__main__":
     print("This module provides functions for generating CoT files.")
\ No newline at end of file
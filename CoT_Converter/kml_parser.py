@@ -1,5 +1,6 @@
 import os
 import re
+import copy
 from lxml import etree
 from .utils import sanitize_html_content
 
@@ -11,37 +12,90 @@ NAMESPACES = {
     'xal': 'urn:oasis:names:tc:ciq:xsdschema:xAL:2.0'
 }
 
+# Clark-notation tags, matched directly instead of through prefixed paths
+KML_DOCUMENT = f"{{{NAMESPACES['kml']}}}Document"
+KML_FOLDER = f"{{{NAMESPACES['kml']}}}Folder"
+KML_PLACEMARK = f"{{{NAMESPACES['kml']}}}Placemark"
+KML_STYLE = f"{{{NAMESPACES['kml']}}}Style"
+KML_STYLE_MAP = f"{{{NAMESPACES['kml']}}}StyleMap"
+KML_PAIR = f"{{{NAMESPACES['kml']}}}Pair"
+KML_KEY = f"{{{NAMESPACES['kml']}}}key"
+KML_NAME = f"{{{NAMESPACES['kml']}}}name"
+KML_STYLE_URL = f"{{{NAMESPACES['kml']}}}styleUrl"
+KML_LINE_STYLE = f"{{{NAMESPACES['kml']}}}LineStyle"
+KML_POLY_STYLE = f"{{{NAMESPACES['kml']}}}PolyStyle"
+KML_COLOR = f"{{{NAMESPACES['kml']}}}color"
+KML_WIDTH = f"{{{NAMESPACES['kml']}}}width"
+KML_POINT = f"{{{NAMESPACES['kml']}}}Point"
+KML_POLYGON = f"{{{NAMESPACES['kml']}}}Polygon"
+KML_LINESTRING = f"{{{NAMESPACES['kml']}}}LineString"
+
+# Parser options for this write-only pipeline: skip the ID table and blank-text
+# nodes, allow very large documents and never expand external entities
+PARSER_OPTIONS = dict(collect_ids=False, remove_blank_text=True, huge_tree=True, resolve_entities=False)
+
+# XPath expressions compiled once at import instead of on every lookup
+_FIND_COORDS = etree.XPath('./kml:coordinates/text()', namespaces=NAMESPACES, smart_strings=False)
+_FIND_OUTER_COORDS = etree.XPath('.//kml:outerBoundaryIs/kml:LinearRing/kml:coordinates/text()',
+                                 namespaces=NAMESPACES, smart_strings=False)
+
+# Ampersands that do not start a predefined entity, escaped before recovery
+# so the text around them survives instead of being dropped by the parser
+_AMP_FIX = re.compile(rb'&(?!(?:amp|lt|gt|quot|apos|#[0-9]+|#x[0-9a-fA-F]+);)')
+
+def find_child(element, tag):
+    """Return the first direct child of element with the given Clark tag, or None."""
+    for child in element.iterchildren(tag):
+        return child
+    return None
+
+def parse_coordinate_text(text):
+    """Parse a KML coordinates string into (lat, lon, hae) tuples.
+
+    Tuples with fewer than two components are skipped and a missing altitude
+    defaults to 0.0. Raises ValueError on non-numeric components. When every
+    tuple is 3D, or every tuple is 2D, the text is parsed as one flat run of
+    numbers; anything else is parsed tuple by tuple.
+    """
+    try:
+        # Split every component in one pass; str.split beats a [,\s]+ regex here
+        flat = list(map(float, text.replace(',', ' ').split()))
+    except ValueError:
+        flat = None
+    if flat:
+        # Every tuple must have the same arity; the value count rules out empty components
+        tokens = text.split()
+        arities = {token.count(',') for token in tokens}
+        values = iter(flat)
+        if arities == {2} and len(flat) == 3 * len(tokens):
+            return [(lat, lon, hae) for lon, lat, hae in zip(values, values, values)]
+        if arities == {1} and len(flat) == 2 * len(tokens):
+            return [(lat, lon, 0.0) for lon, lat in zip(values, values)]
+
+    # Mixed or malformed tuples: parse each one separately
+    rows = [token.split(',') for token in text.split()]
+    return [(float(row[1]), float(row[0]), float(row[2]) if len(row) > 2 else 0.0)
+            for row in rows if len(row) >= 2]
+
 def extract_coordinates(geometry_element):
     """Extract coordinates from a KML geometry element (Point, LineString, etc.)."""
     if geometry_element is None:
         return None
 
-    # Find the <coordinates> tag
-    coordinates_text = geometry_element.find('./kml:coordinates', namespaces=NAMESPACES)
-    if coordinates_text is None or coordinates_text.text is None:
+    # Find the <coordinates> text
+    coordinates_text = _FIND_COORDS(geometry_element)
+    if not coordinates_text:
         return None
 
     # Parse the coordinates (longitude, latitude, altitude)
-    coordinates = []
     try:
-        for coord in coordinates_text.text.strip().split():
-            parts = coord.split(',')
-            if len(parts) < 2:
-                continue
-            
-            lon = float(parts[0])
-            lat = float(parts[1])
-            
-            # Validate coordinate ranges
-            if not (-180 <= lon <= 180) or not (-90 <= lat <= 90):
-                continue
-                
-            hae = float(parts[2]) if len(parts) > 2 else 0.0
-            coordinates.append((lat, lon, hae))
+        coordinates = parse_coordinate_text(coordinates_text[0])
     except ValueError as e:
         print(f"Warning: Invalid coordinate format: {e}")
         return None
 
+    # Validate coordinate ranges
+    coordinates = [c for c in coordinates if -90 <= c[0] <= 90 and -180 <= c[1] <= 180]
     return coordinates if coordinates else None
 
 def extract_polygon_coordinates(polygon_element):
@@ -50,30 +104,23 @@ def extract_polygon_coordinates(polygon_element):
         return None
     
     # Find outer boundary coordinates
-    outer_boundary = polygon_element.find('.//kml:outerBoundaryIs/kml:LinearRing/kml:coordinates', namespaces=NAMESPACES)
-    if outer_boundary is None or outer_boundary.text is None:
+    outer_boundary = _FIND_OUTER_COORDS(polygon_element)
+    if not outer_boundary:
         return None
     
-    coordinates = []
-    coord_pairs = outer_boundary.text.strip().split()
-    for coord_pair in coord_pairs:
-        if coord_pair.strip():
-            parts = coord_pair.split(',')
-            if len(parts) >= 2:
-                lon, lat = float(parts[0]), float(parts[1])
-                alt = float(parts[2]) if len(parts) > 2 else 0.0
-                coordinates.append((lat, lon, alt))
-    
-    return coordinates
+    return parse_coordinate_text(outer_boundary[0])
 
 def calculate_centroid(coordinates):
     """Calculate the centroid of a polygon."""
     if not coordinates:
         return None
     
-    lat_sum = sum(coord[0] for coord in coordinates)
-    lon_sum = sum(coord[1] for coord in coordinates)
-    alt_sum = sum(coord[2] for coord in coordinates)
+    # Sum all three axes in one pass instead of building a tuple per axis
+    lat_sum = lon_sum = alt_sum = 0.0
+    for lat, lon, alt in coordinates:
+        lat_sum += lat
+        lon_sum += lon
+        alt_sum += alt
     count = len(coordinates)
     
     return (lat_sum/count, lon_sum/count, alt_sum/count)
@@ -83,41 +130,63 @@ def extract_linestring_coordinates(linestring_element):
     if linestring_element is None:
         return None
 
-    # Find the <coordinates> tag within the LineString element
-    coordinates_text = linestring_element.find('./kml:coordinates', namespaces=NAMESPACES)
-    if coordinates_text is None or coordinates_text.text is None:
+    # Find the <coordinates> text within the LineString element
+    coordinates_text = _FIND_COORDS(linestring_element)
+    if not coordinates_text:
         return None
 
     # Parse the coordinates (longitude, latitude, altitude)
-    coordinates = []
-    coord_pairs = coordinates_text.text.strip().split()
-    for coord_pair in coord_pairs:
-        if coord_pair.strip():
-            parts = coord_pair.split(',')
-            if len(parts) >= 2:
-                lon, lat = float(parts[0]), float(parts[1])
-                alt = float(parts[2]) if len(parts) > 2 else 0.0
-                coordinates.append((lat, lon, alt))
-
-    return coordinates
+    return parse_coordinate_text(coordinates_text[0])
+
+def _release(elem):
+    """Clear a processed element and drop the siblings already handled before it."""
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+def scan_kml_file(file_path):
+    """Collect shared styles by id and count placemarks in one streaming pass.
+
+    Both Style and StyleMap elements are collected; a Style inside a StyleMap
+    pair is kept as part of its StyleMap.
+    """
+    styles = {}
+    count = 0
+    tags = (KML_STYLE, KML_STYLE_MAP, KML_PLACEMARK)
+    for _, elem in etree.iterparse(file_path, events=('end',), tag=tags, **PARSER_OPTIONS):
+        if elem.tag == KML_STYLE and elem.getparent() is not None and elem.getparent().tag == KML_PAIR:
+            continue
+        if elem.tag != KML_PLACEMARK:
+            style_id = elem.get('id')
+            if style_id:
+                styles[style_id] = copy.deepcopy(elem)
+        else:
+            count += 1
+        _release(elem)
+    return styles, count
+
+def iter_placemarks(file_path):
+    """Yield placemarks one at a time, freeing each once the caller moves on."""
+    for _, placemark in etree.iterparse(file_path, events=('end',), tag=KML_PLACEMARK, **PARSER_OPTIONS):
+        yield placemark
+        _release(placemark)
 
 def parse_kml_file(file_path, debug=False):
-    """Parse KML file and return placemarks."""
+    """Parse KML file and return a placemark iterator and the shared styles.
+
+    Placemarks are streamed with iterparse rather than loaded as a full tree,
+    so memory use stays bounded by the largest single placemark.
+    """
     try:
-        tree = etree.parse(file_path)
-        root = tree.getroot()
-        
-        # Find all placemarks
-        placemarks = root.xpath('//kml:Placemark', namespaces=NAMESPACES)
-        
-        if debug:
-            print(f"Found {len(placemarks)} placemarks")
-            
-        return placemarks, root  # Return root for style parsing
-        
+        styles, count = scan_kml_file(file_path)
     except Exception as e:
         raise Exception(f"Failed to parse KML file: {e}")
 
+    if debug:
+        print(f"Found {count} placemarks")
+
+    return iter_placemarks(file_path), styles  # Return styles for style lookup
+
 def diagnose_kml(file_path):
     """Diagnostic function for KML files."""
     print(f"Diagnosing KML file: {file_path}")
@@ -127,7 +196,7 @@ def diagnose_kml(file_path):
             
         # Check for basic XML syntax
         try:
-            tree = etree.parse(file_path)
+            tree = etree.parse(file_path, etree.XMLParser(**PARSER_OPTIONS))
         except etree.XMLSyntaxError as e:
             print(f"XML Syntax Error: {e}")
             return False
@@ -139,13 +208,11 @@ def diagnose_kml(file_path):
             return False
             
         # Check for Document or Folder
-        if not root.find('.//kml:Document', namespaces=NAMESPACES) and \
-           not root.find('.//kml:Folder', namespaces=NAMESPACES):
+        if next(root.iter(KML_DOCUMENT, KML_FOLDER), None) is None:
             print("Warning: No Document or Folder elements found")
             
         # Check for Placemarks
-        placemarks = root.findall('.//kml:Placemark', namespaces=NAMESPACES)
-        if not placemarks:
+        if next(root.iter(KML_PLACEMARK), None) is None:
             print("Warning: No Placemarks found in the file")
             
         print("Diagnosis complete")
@@ -159,21 +226,26 @@ def attempt_repair(file_path):
     """Attempt to repair malformed KML."""
     print(f"Attempting to repair: {file_path}")
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # Work on the raw bytes; the checks below are ASCII and the parser
+        # decodes the content itself, so there is no decode/encode round trip
+        with open(file_path, 'rb') as f:
             content = f.read()
             
         # Try to fix common issues
         # 1. Add missing XML declaration
-        if not content.strip().startswith('<?xml'):
-            content = '<?xml version="1.0" encoding="UTF-8"?>\n' + content
+        if not content.lstrip().startswith(b'<?xml'):
+            content = b'<?xml version="1.0" encoding="UTF-8"?>\n' + content
             
         # 2. Fix missing or incorrect namespace declarations
-        if 'xmlns=' not in content and '<kml' in content:
-            content = content.replace('<kml', '<kml xmlns="http://www.opengis.net/kml/2.2"')
+        if b'xmlns=' not in content and b'<kml' in content:
+            content = content.replace(b'<kml', b'<kml xmlns="http://www.opengis.net/kml/2.2"')
+            
+        # 3. Escape stray ampersands
+        content = _AMP_FIX.sub(b'&amp;', content)
             
-        # 3. Close unclosed tags
-        parser = etree.XMLParser(recover=True)
-        tree = etree.fromstring(content.encode('utf-8'), parser)
+        # 4. Close unclosed tags
+        parser = etree.XMLParser(recover=True, collect_ids=False, huge_tree=True)
+        tree = etree.fromstring(content, parser)
         
         # Save repaired content to a new file
         repaired_path = file_path + '.repaired'
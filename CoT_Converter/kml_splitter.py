@@ -6,11 +6,12 @@ This script processes a KML file containing multiple layers (folders) and
 creates individual KML files for each layer while preserving all layer information.
 
 Usage:
-    python kml_splitter.py input.kml [--debug] [--force]
+    python kml_splitter.py input.kml [--debug] [--force] [--workers N]
 
 Options:
     --debug     Show detailed diagnostic information about the KML file
     --force     Attempt to repair malformed KML files
+    --workers   Number of worker processes used to build the layer files
 
 Output:
     Creates individual KML files named after each layer in the input file
@@ -19,9 +20,13 @@ Output:
 import sys
 import os
 import re
+import copy
+import mmap
+import contextlib
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from lxml import etree
-import xml.etree.ElementTree as ET  # For fallback parsing
 
 # Define common KML namespaces
 NAMESPACES = {
@@ -31,12 +36,41 @@ NAMESPACES = {
     'xal': 'urn:oasis:names:tc:ciq:xsdschema:xAL:2.0'
 }
 
+# Tags matched while streaming, with and without the KML namespace
+KML_NS = NAMESPACES['kml']
+KML_TAGS = (f"{{{KML_NS}}}kml", "kml")
+DOCUMENT_TAGS = (f"{{{KML_NS}}}Document", "Document")
+FOLDER_TAGS = (f"{{{KML_NS}}}Folder", "Folder")
+NAME_TAGS = (f"{{{KML_NS}}}name", "name")
+STYLE_TAGS = (f"{{{KML_NS}}}Style", f"{{{KML_NS}}}StyleMap", "Style", "StyleMap")
+
+METADATA_TAGS = tuple(f"{{{KML_NS}}}{tag}" for tag in ('description', 'Snippet', 'ExtendedData'))
+
+# Patterns used by the diagnostics and repair helpers, compiled once at import.
+# They run on the raw file bytes so the whole file never has to be decoded.
+NS_DECL_RE = re.compile(rb'xmlns:(\w+)="([^"]+)"')
+DEFAULT_NS_RE = re.compile(rb'xmlns="([^"]+)"')
+ROOT_ELEMENT_RE = re.compile(rb'<(\w+:?\w*)[^>]*>')
+ENCODING_RE = re.compile(rb'encoding=["\']([^"\']+)["\']')
+KML_ROOT_RE = re.compile(rb'<\w*:?kml[^>]*>')
+# Same pattern as kml_parser._AMP_FIX, so both repair paths leave character
+# references alone; repeated here because this script also runs standalone
+UNESCAPED_AMP_RE = re.compile(rb'&(?!(?:amp|lt|gt|quot|apos|#[0-9]+|#x[0-9a-fA-F]+);)')
+
+# Folders queued per worker process when building layers in parallel
+LAYERS_IN_FLIGHT = 4
+
+# Options for the streaming passes: tolerate broken markup, drop
+# indentation-only text, allow very large documents, never expand entities
+ITERPARSE_OPTIONS = dict(recover=True, remove_blank_text=True, resolve_entities=False, huge_tree=True)
+
+# Drops characters that are invalid in filenames and turns spaces into underscores
+FILENAME_TABLE = str.maketrans({**dict.fromkeys('\\/*?:"<>|'), ' ': '_'})
+
 def sanitize_filename(name):
     """Convert a layer name to a valid filename."""
-    # Remove invalid filename characters
-    name = re.sub(r'[\\/*?:"<>|]', "", name)
-    # Replace spaces with underscores
-    name = name.replace(' ', '_')
+    # Remove invalid filename characters and replace spaces with underscores
+    name = name.translate(FILENAME_TABLE)
     # Make sure it's not empty
     if not name:
         name = "unnamed_layer"
@@ -44,145 +78,148 @@ def sanitize_filename(name):
 
 def create_base_kml():
     """Create a new KML document with necessary structure."""
-    root = etree.Element("{http://www.opengis.net/kml/2.2}kml")
-    doc = etree.SubElement(root, "{http://www.opengis.net/kml/2.2}Document")
+    root = etree.Element(KML_TAGS[0])
+    doc = etree.SubElement(root, DOCUMENT_TAGS[0])
     return root, doc
 
-def copy_styles(source_doc, target_doc):
-    """Copy all style definitions from source to target document."""
-    # Find all Style and StyleMap elements
-    styles = source_doc.findall('.//kml:Style', namespaces=NAMESPACES)
-    styles.extend(source_doc.findall('.//kml:StyleMap', namespaces=NAMESPACES))
-    
-    if not styles:
-        # Try without namespace if no styles found
-        styles = source_doc.findall('.//Style')
-        styles.extend(source_doc.findall('.//StyleMap'))
-    
+def copy_styles(styles, target_doc):
+    """Copy style definitions collected by ``scan_kml_document`` to the target document."""
     # Copy each style to the target document
     for style in styles:
         try:
-            target_doc.append(etree.fromstring(etree.tostring(style)))
+            target_doc.append(copy.deepcopy(style))
         except Exception as e:
             print(f"Warning: Could not copy style: {e}")
 
+def serialize_kml(root):
+    """Serialize a KML tree with proper formatting."""
+    # Pretty print with proper XML declaration
+    return etree.tostring(root, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+
 def save_kml_file(root, filename):
     """Save KML tree to a file with proper formatting."""
-    tree = etree.ElementTree(root)
-    
+    return save_kml_bytes(serialize_kml(root), filename)
+
+def save_kml_bytes(kml_bytes, filename):
+    """Save an already serialized KML document to a file."""
     # Ensure the filename has .kml extension
     if not filename.lower().endswith('.kml'):
         filename += '.kml'
-    
-    # Pretty print with proper XML declaration
-    tree.write(filename, pretty_print=True, 
-              xml_declaration=True, encoding='UTF-8')
-    
+
+    with open(filename, 'wb') as f:
+        f.write(kml_bytes)
+
     return filename
 
 def detect_namespaces(xml_content):
-    """Detect XML namespaces in the content."""
+    """Detect XML namespaces in the raw (bytes) content."""
     custom_namespaces = {}
     
     # Look for namespace declarations in the XML
-    ns_matches = re.findall(r'xmlns:(\w+)="([^"]+)"', xml_content)
+    ns_matches = NS_DECL_RE.findall(xml_content)
     for prefix, uri in ns_matches:
-        custom_namespaces[prefix] = uri
+        custom_namespaces[prefix.decode('ascii')] = uri.decode('utf-8', errors='replace')
     
     # Add the default namespace if present
-    default_ns_match = re.search(r'xmlns="([^"]+)"', xml_content)
+    default_ns_match = DEFAULT_NS_RE.search(xml_content)
     if default_ns_match:
-        custom_namespaces['default'] = default_ns_match.group(1)
+        custom_namespaces['default'] = default_ns_match.group(1).decode('utf-8', errors='replace')
     
     return custom_namespaces
 
+def check_well_formed(file_path):
+    """Parse the file incrementally without building a tree; raises on the first error."""
+    for _, elem in etree.iterparse(file_path, events=('end',), resolve_entities=False, huge_tree=True):
+        release_element(elem)
+
 def diagnose_kml(file_path):
     """Provide diagnostic information about the KML file."""
     print("\n--- KML File Diagnostics ---")
     
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-            
-        # Check for XML declaration
-        if not content.startswith(b'<?xml'):
-            print("Warning: File does not start with XML declaration")
-        
-        # Convert to string for regex
-        content_str = content.decode('utf-8', errors='replace')
+        with open(file_path, 'rb') as f, map_file(f) as content:
+            report_content(content)
         
-        # Check for KML namespace
-        if 'http://www.opengis.net/kml/2.2' not in content_str:
-            print("Warning: Standard KML namespace not found")
-        
-        # Detect all namespaces
-        namespaces = detect_namespaces(content_str)
-        print(f"Detected namespaces: {namespaces}")
-        
-        # Check root element
-        root_match = re.search(r'<(\w+:?\w*)[^>]*>', content_str)
-        if root_match:
-            root_element = root_match.group(1)
-            print(f"Root element: {root_element}")
-            if root_element != 'kml' and not root_element.endswith(':kml'):
-                print(f"Warning: Root element is not 'kml' but '{root_element}'")
-        else:
-            print("Error: Could not identify root element")
-        
-        # Check encoding
-        encoding_match = re.search(r'encoding=["\']([^"\']+)["\']', content_str[:1000])
-        if encoding_match:
-            print(f"Encoding: {encoding_match.group(1)}")
-        else:
-            print("No encoding specified in XML declaration")
-        
-        # Try to parse with different parsers
+        # Stream through the file once; stops at the first syntax error
         try:
-            etree.fromstring(content)
+            check_well_formed(file_path)
             print("✓ lxml parser: File can be parsed")
         except Exception as e:
             print(f"✗ lxml parser error: {e}")
-        
-        try:
-            ET.fromstring(content_str)
-            print("✓ ElementTree parser: File can be parsed")
-        except Exception as e:
-            print(f"✗ ElementTree parser error: {e}")
             
     except Exception as e:
         print(f"Error during diagnostics: {e}")
     
     print("--- End of Diagnostics ---\n")
 
+def map_file(f):
+    """Memory-map an open file read-only; an empty file maps to empty bytes."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return contextlib.nullcontext(b'')
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def report_content(content):
+    """Print the header, namespace, root and encoding checks for raw KML content.
+
+    ``content`` may be bytes or a memory map of the file, so the whole file is
+    never read into memory.
+    """
+    # Check for XML declaration
+    if content[:5] != b'<?xml':
+        print("Warning: File does not start with XML declaration")
+    
+    # Check for KML namespace
+    if content.find(b'http://www.opengis.net/kml/2.2') == -1:
+        print("Warning: Standard KML namespace not found")
+    
+    # Detect all namespaces
+    namespaces = detect_namespaces(content)
+    print(f"Detected namespaces: {namespaces}")
+    
+    # Check root element
+    root_match = ROOT_ELEMENT_RE.search(content)
+    if root_match:
+        root_element = root_match.group(1).decode('ascii')
+        print(f"Root element: {root_element}")
+        if root_element != 'kml' and not root_element.endswith(':kml'):
+            print(f"Warning: Root element is not 'kml' but '{root_element}'")
+    else:
+        print("Error: Could not identify root element")
+    
+    # Check encoding
+    encoding_match = ENCODING_RE.search(content, 0, 1000)
+    if encoding_match:
+        print(f"Encoding: {encoding_match.group(1).decode('ascii', errors='replace')}")
+    else:
+        print("No encoding specified in XML declaration")
+
 def attempt_repair(file_path):
     """Attempt to repair common KML formatting issues."""
     try:
         with open(file_path, 'rb') as f:
             content = f.read()
         
-        content_str = content.decode('utf-8', errors='replace')
-        
         # 1. Ensure XML declaration exists
-        if not content_str.startswith('<?xml'):
-            content_str = '<?xml version="1.0" encoding="UTF-8"?>\n' + content_str
+        if not content.startswith(b'<?xml'):
+            content = b'<?xml version="1.0" encoding="UTF-8"?>\n' + content
         
         # 2. Check for KML namespace in root element
-        if '<kml' in content_str and 'xmlns' not in content_str[:content_str.find('>')+1]:
-            content_str = content_str.replace('<kml', '<kml xmlns="http://www.opengis.net/kml/2.2"', 1)
+        if b'<kml' in content and b'xmlns' not in content[:content.find(b'>')+1]:
+            content = content.replace(b'<kml', b'<kml xmlns="http://www.opengis.net/kml/2.2"', 1)
         
         # 3. Ensure root element is kml if missing
-        if not re.search(r'<\w*:?kml[^>]*>', content_str):
-            if '<Document' in content_str:
-                content_str = content_str.replace('<Document', '<kml xmlns="http://www.opengis.net/kml/2.2"><Document', 1)
-                content_str += '</kml>'
+        if not KML_ROOT_RE.search(content):
+            if b'<Document' in content:
+                content = content.replace(b'<Document', b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document', 1)
+                content += b'</kml>'
         
         # 4. Fix common XML issues
-        content_str = re.sub(r'&(?!amp;|lt;|gt;|quot;|apos;)', '&amp;', content_str)
+        content = UNESCAPED_AMP_RE.sub(b'&amp;', content)
         
         # Write repaired content to a temporary file
         temp_file = file_path + '.repaired.kml'
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            f.write(content_str)
+        with open(temp_file, 'wb') as f:
+            f.write(content)
         
         print(f"Attempted to repair KML file. Repaired version saved as {temp_file}")
         return temp_file
@@ -191,53 +228,181 @@ def attempt_repair(file_path):
         print(f"Error during repair attempt: {e}")
         return file_path
 
-def process_kml_file(input_file, debug=False):
-    """Process a KML file and split it by folders (layers) or individual elements."""
+def find_child(parent, *tags):
+    """Return the first direct child of ``parent`` with one of ``tags``, or None.
+
+    A single walk over the children replaces separate namespaced and plain
+    ``find`` calls.
+    """
+    return next(parent.iterchildren(*tags), None)
+
+def release_element(elem):
+    """Clear a processed element and drop the siblings already handled before it."""
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+def scan_kml_document(input_file):
+    """First streaming pass over a KML file.
+
+    Finds the Document, its name and every Style/StyleMap (copied out of the
+    tree), and counts the folders. Top-level folders are released as soon as
+    they end, so only a file without folders is kept in memory whole.
+    Returns ``(root, doc, doc_name, styles, folder_tags, folder_count)``;
+    ``folder_tags`` is the namespaced or plain Folder tag, whichever occurs.
+    """
+    doc = None
+    names = {}
+    styles = {tag: [] for tag in STYLE_TAGS}
+    folder_counts = dict.fromkeys(FOLDER_TAGS, 0)
+    folder_depth = 0
+
+    context = etree.iterparse(input_file, events=('start', 'end'),
+                              tag=DOCUMENT_TAGS + FOLDER_TAGS + NAME_TAGS + STYLE_TAGS,
+                              **ITERPARSE_OPTIONS)
+    for event, elem in context:
+        tag = elem.tag
+        if event == 'start':
+            if tag in DOCUMENT_TAGS:
+                if doc is None:
+                    doc = elem
+            elif tag in FOLDER_TAGS and doc is not None:
+                folder_depth += 1
+            continue
+
+        if doc is None:
+            continue
+        if tag in NAME_TAGS:
+            # Keep the first name per tag even when empty, as find() would
+            if tag not in names:
+                names[tag] = elem.text
+        elif tag in STYLE_TAGS:
+            styles[tag].append(copy.deepcopy(elem))
+        elif tag in FOLDER_TAGS:
+            folder_counts[tag] += 1
+            folder_depth -= 1
+            if folder_depth == 0:
+                release_element(elem)
+
+    # Prefer namespaced elements and fall back to plain ones, as find() would
+    kml_styles = styles[STYLE_TAGS[0]] + styles[STYLE_TAGS[1]]
+    doc_styles = kml_styles or styles[STYLE_TAGS[2]] + styles[STYLE_TAGS[3]]
+    doc_name = names[NAME_TAGS[0]] if NAME_TAGS[0] in names else names.get(NAME_TAGS[1])
+    folder_tag = FOLDER_TAGS[0] if folder_counts[FOLDER_TAGS[0]] else FOLDER_TAGS[1]
+    return context.root, doc, doc_name, doc_styles, folder_tag, folder_counts[folder_tag]
+
+def iter_folders(input_file, folder_tag):
+    """Second streaming pass: yield ``(index, folder)`` for every folder.
+
+    ``index`` is the folder's position in document order. Nested folders are
+    yielded before the folder containing them, and a folder is only released
+    once no enclosing folder still needs its content.
+    """
+    index = 0
+    open_folders = []
+    for event, folder in etree.iterparse(input_file, events=('start', 'end'), tag=folder_tag,
+                                         **ITERPARSE_OPTIONS):
+        if event == 'start':
+            open_folders.append(index)
+            index += 1
+            continue
+        yield open_folders.pop(), folder
+        if not open_folders:
+            release_element(folder)
+
+def build_layer(index, folder, doc_name, styles):
+    """Build the standalone KML document for one folder.
+
+    ``index`` is the folder's position in document order, used to name
+    unnamed folders. Returns ``(folder_name, kml_bytes)``.
+    """
+    # Get folder name
+    name_elem = find_child(folder, *NAME_TAGS)
+    if name_elem is not None and name_elem.text:
+        folder_name = name_elem.text
+    else:
+        folder_name = f"unnamed_layer_{index}"
+
+    # Create a new KML document for this folder
+    new_root, new_doc = create_base_kml()
+
+    # Set document name
+    doc_name_elem = etree.SubElement(new_doc, NAME_TAGS[0])
+    doc_name_elem.text = f"{doc_name} - {folder_name}"
+
+    # Copy styles from original document
+    copy_styles(styles, new_doc)
+
+    # Copy this folder to the new document
+    new_doc.append(copy.deepcopy(folder))
+    return folder_name, serialize_kml(new_root)
+
+def iter_layers(input_file, folder_tag, doc_name, styles, workers=1):
+    """Yield ``(folder_name, kml_bytes)`` for every folder, in ``iter_folders`` order.
+
+    With ``workers`` > 1 the documents are built in that many worker
+    processes. lxml elements cannot be pickled, so folders and styles are
+    sent serialized, and only a few folders per worker are queued at a time
+    to keep memory bounded.
+    """
+    folders = iter_folders(input_file, folder_tag)
+    if workers <= 1:
+        for index, folder in folders:
+            yield build_layer(index, folder, doc_name, styles)
+        return
+
+    style_xml = [etree.tostring(style, with_tail=False) for style in styles]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_layer_worker,
+                             initargs=(doc_name, style_xml)) as pool:
+        pending = deque()
+        for index, folder in folders:
+            pending.append(pool.submit(_build_serialized_layer, index, etree.tostring(folder, with_tail=False)))
+            if len(pending) >= workers * LAYERS_IN_FLIGHT:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+_worker_doc_name = None
+_worker_styles = []
+
+def _init_layer_worker(doc_name, style_xml):
+    """Rebuild the document name and styles inside a worker process."""
+    global _worker_doc_name, _worker_styles
+    _worker_doc_name = doc_name
+    _worker_styles = [etree.fromstring(xml) for xml in style_xml]
+
+def _build_serialized_layer(index, folder_xml):
+    """Build one layer from a serialized folder inside a worker process."""
+    return build_layer(index, etree.fromstring(folder_xml), _worker_doc_name, _worker_styles)
+
+def process_kml_file(input_file, debug=False, workers=1):
+    """Process a KML file and split it by folders (layers) or individual elements.
+
+    The file is streamed with iterparse, so a file with folders only ever
+    holds one top-level folder in memory at a time. With ``workers`` > 1 the
+    per-folder documents are built in parallel worker processes.
+    """
     try:
-        # First try with lxml's parser
-        parser = etree.XMLParser(recover=True, remove_blank_text=True, resolve_entities=False)
-        tree = etree.parse(input_file, parser)
-        root = tree.getroot()
+        root, doc, doc_name, styles, folder_tag, folder_count = scan_kml_document(input_file)
 
         # Check if we have the right root
-        root_tag = etree.QName(root).localname
-        if root_tag != 'kml':
+        if root.tag not in KML_TAGS:
+            root_tag = etree.QName(root).localname
             print(f"Warning: Root element is '{root_tag}', not 'kml'. Attempting to process anyway.")
 
-        # Try to find Document, with or without namespace
-        doc = root.find('.//kml:Document', namespaces=NAMESPACES)
-        if doc is None:
-            doc = root.find('.//Document')
-
-        # If we still can't find Document, maybe the root is already a Document
-        if doc is None and etree.QName(root).localname == 'Document':
-            doc = root
-
         if doc is None:
             raise ValueError("No Document element found in the KML file")
 
         # Get document name if available
-        doc_name = None
-        name_elem = doc.find('.//kml:name', namespaces=NAMESPACES)
-        if name_elem is None:
-            name_elem = doc.find('.//name')
-
-        if name_elem is not None and name_elem.text:
-            doc_name = name_elem.text
-        else:
+        if not doc_name:
             doc_name = os.path.basename(input_file)
 
-        # Find all folders, with or without namespace
-        folders = doc.findall('.//kml:Folder', namespaces=NAMESPACES)
-        if not folders:
-            folders = doc.findall('.//Folder')
-
-        if not folders:
+        if not folder_count:
             print(f"No folders/layers found in {input_file}")
             print("Looking for individual elements directly in the Document...")
 
-            # If no folders, process all child elements of the Document
-            elements = doc.findall('./*', namespaces=NAMESPACES)
+            # Without folders nothing was released, so the Document is still complete
+            elements = list(doc.iterchildren(etree.Element))
 
             if not elements:
                 print("No elements found either. Nothing to process.")
@@ -248,31 +413,32 @@ def process_kml_file(input_file, debug=False):
             # Process each element
             for i, element in enumerate(elements):
                 # Get element tag name (e.g., Placemark, Folder, GroundOverlay)
-                tag_name = etree.QName(element.tag).localname
+                tag_name = element.tag.rpartition('}')[2]
 
                 # Generate a unique name for the layer
-                element_name = element.findtext('kml:name', namespaces=NAMESPACES) or f"{tag_name}_{i+1}"
+                name_elem = find_child(element, NAME_TAGS[0])
+                element_name = (name_elem is not None and name_elem.text) or f"{tag_name}_{i+1}"
                 print(f"Processing element: {element_name} (Tag: {tag_name})")
 
                 # Create a new KML document for this element
                 new_root, new_doc = create_base_kml()
 
                 # Set document name (use the sublayer name)
-                doc_name_elem = etree.SubElement(new_doc, "{http://www.opengis.net/kml/2.2}name")
+                doc_name_elem = etree.SubElement(new_doc, NAME_TAGS[0])
                 doc_name_elem.text = element_name  # Use the sublayer name
 
                 # Copy styles from original document
-                copy_styles(doc, new_doc)
+                copy_styles(styles, new_doc)
 
                 # Copy this element to the new document
-                new_element = etree.fromstring(etree.tostring(element))
+                new_element = copy.deepcopy(element)
                 new_doc.append(new_element)
 
                 # Copy additional metadata (e.g., description, extended data)
-                for metadata_tag in ['description', 'Snippet', 'ExtendedData']:
-                    metadata_elem = element.find(f'kml:{metadata_tag}', namespaces=NAMESPACES)
+                for metadata_tag in METADATA_TAGS:
+                    metadata_elem = find_child(element, metadata_tag)
                     if metadata_elem is not None:
-                        new_metadata_elem = etree.fromstring(etree.tostring(metadata_elem))
+                        new_metadata_elem = copy.deepcopy(metadata_elem)
                         new_doc.append(new_metadata_elem)
 
                 # Save to a new file
@@ -286,44 +452,19 @@ def process_kml_file(input_file, debug=False):
             print("All elements have been successfully extracted to individual KML files.")
             return
 
-        print(f"Found {len(folders)} layers in {input_file}")
+        print(f"Found {folder_count} layers in {input_file}")
 
-        # Process each folder
-        for folder in folders:
-            # Get folder name
-            folder_name = None
-            name_elem = folder.find('./kml:name', namespaces=NAMESPACES)
-            if name_elem is None:
-                name_elem = folder.find('./name')
-
-            if name_elem is not None and name_elem.text:
-                folder_name = name_elem.text
-            else:
-                folder_name = f"unnamed_layer_{folders.index(folder)}"
+        # Save KML files relative to the script's location
+        script_dir = os.path.dirname(os.path.abspath(__file__))
 
+        # Process each folder
+        for folder_name, kml_bytes in iter_layers(input_file, folder_tag, doc_name, styles, workers):
             print(f"Processing layer: {folder_name}")
-
-            # Create a new KML document for this folder
-            new_root, new_doc = create_base_kml()
-
-            # Set document name
-            doc_name_elem = etree.SubElement(new_doc, "{http://www.opengis.net/kml/2.2}name")
-            doc_name_elem.text = f"{doc_name} - {folder_name}"
-
-            # Copy styles from original document
-            copy_styles(doc, new_doc)
-
-            # Copy this folder to the new document
             try:
-                new_folder = etree.fromstring(etree.tostring(folder))
-                new_doc.append(new_folder)
-
                 # Save to a new file
                 safe_name = sanitize_filename(folder_name)
-                # Save KML file relative to the script's location
-                script_dir = os.path.dirname(os.path.abspath(__file__))
                 output_file = os.path.join(script_dir, f"{safe_name}.kml")
-                save_kml_file(new_root, output_file)
+                save_kml_bytes(kml_bytes, output_file)
                 print(f"Created: {output_file}")
             except Exception as e:
                 print(f"Error processing folder '{folder_name}': {e}")
@@ -342,6 +483,8 @@ def main():
     parser.add_argument('input_file', help='KML file to process')
     parser.add_argument('--debug', action='store_true', help='Show detailed diagnostic information')
     parser.add_argument('--force', action='store_true', help='Attempt to repair malformed KML files')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes used to build the layer files (default: 1)')
     args = parser.parse_args()
     
     if not os.path.exists(args.input_file):
@@ -363,7 +506,7 @@ def main():
         input_file = attempt_repair(args.input_file)
     
     # Process the KML file
-    process_kml_file(input_file, args.debug)
+    process_kml_file(input_file, args.debug, args.workers)
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,19 @@
 import os
+import shutil
 import zipfile
 import argparse
 from datetime import datetime
 
-def extract_kmz(kmz_file, output_dir):
-    """Extract .kmz file into individual .kml files while preserving metadata."""
+# Buffer size used when streaming archive entries to disk
+COPY_BUFFER_SIZE = 1 << 20
+
+def extract_kmz(kmz_file, output_dir, kml_only=False):
+    """Extract .kmz file into individual .kml files while preserving metadata.
+
+    Top-level .kml entries are streamed straight to their timestamped names in
+    a single pass over the archive. Other entries (icons, images, nested
+    files) are extracted as-is unless ``kml_only`` is set.
+    """
     if not os.path.exists(kmz_file):
         print(f"Error: File '{kmz_file}' does not exist.")
         return
@@ -18,19 +27,20 @@ def extract_kmz(kmz_file, output_dir):
 
     try:
         with zipfile.ZipFile(kmz_file, 'r') as kmz:
-            # Extract all files
-            kmz.extractall(output_dir)
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            for info in kmz.infolist():
+                if '/' in info.filename or not info.filename.endswith(".kml"):
+                    if not kml_only:
+                        kmz.extract(info, output_dir)
+                    continue
+
+                # Write top-level .kml files directly under a name that includes metadata
+                file_name = os.path.basename(info.filename)
+                new_name = f"{os.path.splitext(file_name)[0]}_{timestamp}.kml"
+                with kmz.open(info) as src, open(os.path.join(output_dir, new_name), 'wb') as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+                print(f"Extracted '{file_name}' as '{new_name}'")
             print(f"Extracted '{kmz_file}' into '{output_dir}'")
-
-            # Rename .kml files to include metadata
-            for file_name in os.listdir(output_dir):
-                if file_name.endswith(".kml"):
-                    original_path = os.path.join(output_dir, file_name)
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    new_name = f"{os.path.splitext(file_name)[0]}_{timestamp}.kml"
-                    new_path = os.path.join(output_dir, new_name)
-                    os.rename(original_path, new_path)
-                    print(f"Renamed '{file_name}' to '{new_name}'")
     except zipfile.BadZipFile:
         print(f"Error: File '{kmz_file}' is not a valid .kmz file.")
     except Exception as e:
@@ -40,9 +50,10 @@ def main():
     parser = argparse.ArgumentParser(description="Unzip a .kmz file into individual .kml files while preserving metadata.")
     parser.add_argument("kmz_file", help="Path to the .kmz file to extract")
     parser.add_argument("--output", default="./extracted_kmls", help="Directory to save extracted .kml files (default: ./extracted_kmls)")
+    parser.add_argument("--kml-only", action="store_true", help="Only extract the .kml files, skipping icons and other resources")
     args = parser.parse_args()
 
-    extract_kmz(args.kmz_file, args.output)
+    extract_kmz(args.kmz_file, args.output, args.kml_only)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
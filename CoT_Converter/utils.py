@@ -1,32 +1,40 @@
 import re
+import html
 import datetime
 
+# Drops characters that are invalid in filenames and turns spaces into underscores
+_FILENAME_TABLE = str.maketrans({**dict.fromkeys('\\/*?:"<>|'), ' ': '_'})
+
+# Markup tags stripped from HTML content, compiled once at import
+_TAG_RE = re.compile(r'<[^>]+>')
+
 def sanitize_filename(name):
     """Convert a name to a valid filename."""
     if not name:
         return "unnamed_feature"
         
-    # Remove invalid characters and replace spaces with underscores
-    sanitized = re.sub(r'[\\/*?:"<>|]', "", name).replace(' ', '_')
-    
-    # Remove any non-ASCII characters
-    sanitized = re.sub(r'[^\x00-\x7F]+', '', sanitized)
+    # Remove invalid characters, replace spaces with underscores and drop non-ASCII characters
+    sanitized = name.translate(_FILENAME_TABLE).encode('ascii', 'ignore').decode('ascii')
     
     # Ensure the filename is not empty after sanitization
     return sanitized.strip('_') or "unnamed_feature"
 
+def _format_utc(moment):
+    """Format an aware UTC datetime as ISO 8601 with a 'Z' suffix."""
+    return moment.replace(tzinfo=None).isoformat(timespec='microseconds') + 'Z'
+
 def get_current_time():
     """Get the current time in ISO 8601 format."""
-    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return _format_utc(datetime.datetime.now(datetime.timezone.utc))
 
 def get_stale_time(hours=24):
     """Get the stale time (default 24 hours from now) in ISO 8601 format."""
-    return (datetime.datetime.utcnow() + datetime.timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return _format_utc(datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=hours))
 
 def sanitize_html_content(content):
     """Sanitize HTML content by removing tags and escaping special characters."""
-    text_content = re.sub(r'<[^>]+>', ' ', content)
-    return text_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    text_content = _TAG_RE.sub(' ', content)
+    return html.escape(text_content, quote=False)
 
 if __name__ == "__main__":
     print("This module provides utility functions for the KML to CoT converter.")
\ No newline at end of file
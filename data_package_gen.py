@@ -1,9 +1,21 @@
 import os
-import shutil
+import re
+import html
+import json
+import mmap
 import zipfile
 import argparse
 from datetime import datetime
 
+# Sidecar written by the converter next to the CoT files, mapping UIDs to call signs
+INDEX_FILENAME = "_index.jsonl"
+
+# Matches the contact callsign with either quote style; the converter writes single quotes
+CALLSIGN_RE = re.compile(rb"""<contact\s+callsign=(["'])(.*?)\1""", re.DOTALL)
+
+# Fastest deflate level; small CoT files barely shrink further at higher levels
+ZIP_COMPRESSLEVEL = 1
+
 def create_directories(base_dir):
     """Create 'MANIFEST' directory."""
     manifest_dir = os.path.join(base_dir, "MANIFEST")
@@ -13,60 +25,92 @@ def create_directories(base_dir):
 def extract_call_sign(file_path):
     """Extract the call sign from the .cot file."""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if "<contact callsign=" in line:
-                    start = line.find('callsign="') + len('callsign="')
-                    end = line.find('"', start)
-                    return line[start:end]
+        # Scan the mapped file with one regex search instead of decoding it line by line
+        with open(file_path, "rb") as f:
+            # An empty file cannot be mapped and has no call sign anyway
+            if os.fstat(f.fileno()).st_size == 0:
+                return "Unknown"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                match = CALLSIGN_RE.search(mm)
+                if match:
+                    return html.unescape(match.group(2).decode("utf-8"))
     except Exception as e:
         print(f"Warning: Failed to extract call sign from {file_path}: {e}")
     return "Unknown"
 
-def move_files_to_uid_folders(source_dir, base_dir):
-    """Move files from 'converted_files' to individual UID folders."""
+def load_call_sign_index(source_dir):
+    """Load the UID to call sign index written by the converter, if there is one."""
+    call_signs = {}
+    index_path = os.path.join(source_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return call_signs
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    call_signs[entry["uid"]] = entry["callsign"]
+    except Exception as e:
+        print(f"Warning: Failed to read call sign index {index_path}: {e}")
+    return call_signs
+
+def collect_cot_files(source_dir):
+    """Collect the UID and call sign of every CoT file in 'converted_files'.
+
+    Call signs come from the converter's index when it lists the file, so only
+    files missing from it are opened and scanned.
+    """
+    call_signs = load_call_sign_index(source_dir)
     file_data = []  # List of tuples (UID, call_sign)
     for file in os.listdir(source_dir):
         if file.endswith(".cot"):
             uid = os.path.splitext(file)[0]  # Extract UID from file name
-            call_sign = extract_call_sign(os.path.join(source_dir, file))  # Extract call sign
-            uid_folder = os.path.join(base_dir, uid)  # Create folder for UID
-            os.makedirs(uid_folder, exist_ok=True)
-            destination = os.path.join(uid_folder, file)  # Place file in UID folder
-            shutil.copy(os.path.join(source_dir, file), destination)
+            call_sign = call_signs.get(uid)
+            if call_sign is None:
+                call_sign = extract_call_sign(os.path.join(source_dir, file))  # Extract call sign
             file_data.append((uid, call_sign))
     return file_data
 
+# manifest.xml fragments; values are escaped with html.escape before being filled in
+MANIFEST_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<MissionPackageManifest version="2">
+   <Configuration>
+      <Parameter name="name" value="%s"/>
+      <Parameter name="uid" value="%s"/>
+   </Configuration>
+   <Contents>
+"""
+MANIFEST_CONTENT = """      <Content ignore="false" zipEntry="%s/%s.cot">
+         <Parameter name="uid" value="%s"/>
+         <Parameter name="name" value="%s"/>
+      </Content>
+"""
+MANIFEST_FOOTER = """   </Contents>
+</MissionPackageManifest>
+"""
+
 def create_manifest(file_data, manifest_dir, package_name):
     """Create manifest.xml file based on the UID folders."""
     manifest_path = os.path.join(manifest_dir, "manifest.xml")
+    parts = [MANIFEST_HEADER % (html.escape(package_name), datetime.now().strftime("%Y%m%d%H%M%S"))]  # Use package name
+    parts.extend(MANIFEST_CONTENT % (uid, uid, uid, html.escape(call_sign)) for uid, call_sign in file_data)
+    parts.append(MANIFEST_FOOTER)
     with open(manifest_path, "w", encoding="utf-8") as manifest_file:
-        manifest_file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        manifest_file.write('<MissionPackageManifest version="2">\n')
-        manifest_file.write('   <Configuration>\n')
-        manifest_file.write(f'      <Parameter name="name" value="{package_name}"/>\n')  # Use package name
-        manifest_file.write(f'      <Parameter name="uid" value="{datetime.now().strftime("%Y%m%d%H%M%S")}"/>\n')
-        manifest_file.write('   </Configuration>\n')
-        manifest_file.write('   <Contents>\n')
-        for uid, call_sign in file_data:
-            manifest_file.write(f'      <Content ignore="false" zipEntry="{uid}/{uid}.cot">\n')
-            manifest_file.write(f'         <Parameter name="uid" value="{uid}"/>\n')
-            manifest_file.write(f'         <Parameter name="name" value="{call_sign}"/>\n')
-            manifest_file.write('      </Content>\n')
-        manifest_file.write('   </Contents>\n')
-        manifest_file.write('</MissionPackageManifest>\n')
+        manifest_file.write("".join(parts))
     print(f"Manifest created at: {manifest_path}")
     return manifest_path
 
-def zip_directories(base_dir, package_name, file_data):
-    """Zip UID folders and 'MANIFEST' directory into a single package."""
+def zip_package(source_dir, base_dir, package_name, file_data, manifest_path):
+    """Write the CoT files and manifest straight into a single package.
+
+    Each CoT file is stored under its own UID folder inside the archive, so the
+    files are not copied into UID folders on disk first.
+    """
     zip_path = os.path.join(base_dir, f"{package_name}.zip")
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(base_dir):
-            for file in files:
-                # Include UID folders and MANIFEST directory in the zip file
-                if "MANIFEST" in root or os.path.basename(root) in [uid for uid, _ in file_data]:
-                    zipf.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), base_dir))
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zipf:
+        for uid, _ in file_data:
+            zipf.write(os.path.join(source_dir, f"{uid}.cot"), f"{uid}/{uid}.cot")
+        zipf.write(manifest_path, "MANIFEST/manifest.xml")
     print(f"Data package created: {zip_path}")
     return zip_path
 
@@ -80,14 +124,14 @@ def main():
     # Create MANIFEST directory
     manifest_dir = create_directories(args.output)
 
-    # Move files to individual UID folders
-    file_data = move_files_to_uid_folders(args.source, args.output)
+    # Collect the CoT files to package
+    file_data = collect_cot_files(args.source)
 
     # Create manifest.xml
-    create_manifest(file_data, manifest_dir, args.package_name)  # Pass package name
+    manifest_path = create_manifest(file_data, manifest_dir, args.package_name)  # Pass package name
 
-    # Zip directories
-    zip_directories(args.output, args.package_name, file_data)
+    # Zip the CoT files and manifest
+    zip_package(args.source, args.output, args.package_name, file_data, manifest_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,10 @@
 import sys
 import os
 import argparse
+import tempfile
 
 from CoT_Converter.kml_parser import diagnose_kml, attempt_repair, parse_kml_file
-from CoT_Converter.cot_generator import process_placemarks
+from CoT_Converter.cot_generator import process_placemarks, ARCHIVE_EXTENSIONS
 from CoT_Converter.utils import sanitize_filename
 
 def main():
@@ -13,13 +14,19 @@ def main():
     parser.add_argument('--prefix', dest='prefix', default=None,
                         help='Prefix for output filenames (default: based on input filename)')
     parser.add_argument('--output', dest='output_dir', default=None,
-                        help='Directory to save output files (default: ./converted_files)')
+                        help='Directory to save output files, or a .zip/.tar archive to collect them in '
+                             '(default: ./converted_files)')
     parser.add_argument('--debug', action='store_true', help='Show detailed diagnostic information')
     parser.add_argument('--force', action='store_true', help='Attempt to repair malformed KML files')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes used to convert placemarks (default: 1)')
+    parser.add_argument('--bundle', action='store_true',
+                        help='Write all events into the single file given by --output, each prefixed '
+                             'with its 4-byte big-endian length (default file: <prefix>.bundle)')
     args = parser.parse_args()
     
     # Check if the input file exists
-    if not os.path.exists(args.input_file):
+    if not os.path.isfile(args.input_file):
         print(f"Error: File '{args.input_file}' not found.")
         sys.exit(1)
     
@@ -27,17 +34,33 @@ def main():
     if not args.prefix:
         args.prefix = sanitize_filename(os.path.splitext(os.path.basename(args.input_file))[0])
     
+    # A bundle is a raw stream of records, not a zip or tar archive
+    if args.bundle and args.output_dir and args.output_dir.lower().endswith(ARCHIVE_EXTENSIONS):
+        print(f"Error: --bundle cannot write to archive path '{args.output_dir}'.")
+        sys.exit(1)
+
     # Use provided output directory or default to "converted_files" in the current directory
-    output_dir = args.output_dir or os.path.join(os.getcwd(), "converted_files")
-    os.makedirs(output_dir, exist_ok=True)
+    if args.bundle:
+        output_dir = args.output_dir or os.path.join(os.getcwd(), f"{args.prefix}.bundle")
+    else:
+        output_dir = args.output_dir or os.path.join(os.getcwd(), "converted_files")
+    # An archive or bundle file is created by the converter itself; only its directory must exist
+    if args.bundle or output_dir.lower().endswith(ARCHIVE_EXTENSIONS):
+        target_dir = os.path.dirname(os.path.abspath(output_dir))
+    else:
+        target_dir = output_dir
+    os.makedirs(target_dir, exist_ok=True)
 
     print(f"Processing: {args.input_file}")
     print(f"Output directory: {output_dir}")
     print(f"Prefix: {args.prefix}")
 
-    # Check if the output directory is writable
-    if not os.access(output_dir, os.W_OK):
-        print(f"Error: Output directory '{output_dir}' is not writable.")
+    # Check if the output directory is writable by creating a throwaway file;
+    # os.access can disagree with what the filesystem actually allows
+    try:
+        tempfile.TemporaryFile(dir=target_dir).close()
+    except OSError:
+        print(f"Error: Output directory '{target_dir}' is not writable.")
         sys.exit(1)
 
     # Run diagnostics if requested
@@ -51,8 +74,8 @@ def main():
 
     # Parse the KML file and process placemarks
     try:
-        placemarks, root = parse_kml_file(input_file, args.debug)
-        process_placemarks(placemarks, output_dir, args.prefix, args.debug)
+        placemarks, styles = parse_kml_file(input_file, args.debug)
+        process_placemarks(placemarks, output_dir, args.prefix, args.debug, styles, args.workers, args.bundle)
     except Exception as e:
         print(f"Error: Failed to process KML file: {e}")
         if args.debug:
@@ -0,0 +1,82 @@
+import tarfile
+import zipfile
+
+from lxml import etree
+
+from CoT_Converter import cot_generator
+
+KML_NS = "http://www.opengis.net/kml/2.2"
+
+CONVERTED = [(b"<event/>", "uid1", "First"), (None, "uid2", "Empty"), (b"<event>2</event>", "uid3", "Third")]
+
+
+def kml(xml):
+    return etree.fromstring(f'<Document xmlns="{KML_NS}">{xml}</Document>')
+
+
+def style_table(document):
+    return {elem.get("id"): elem for elem in document if elem.get("id")}
+
+
+def test_bundle_records_and_offsets(tmp_path):
+    path = str(tmp_path / "out.bundle")
+    results = list(cot_generator._save_to_bundle(iter(CONVERTED), path))
+    assert results == [(f"{path} (offset 0)", "First"), (None, "Empty"), (f"{path} (offset 12)", "Third")]
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data == len(b"<event/>").to_bytes(4, "big") + b"<event/>" + (16).to_bytes(4, "big") + b"<event>2</event>"
+
+
+def test_zip_entries(tmp_path):
+    path = str(tmp_path / "out.zip")
+    results = list(cot_generator._save_to_archive(iter(CONVERTED), path))
+    assert [output for output, _ in results] == [f"{path}/uid1.cot", None, f"{path}/uid3.cot"]
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == ["uid1.cot", "uid3.cot"]
+        assert archive.read("uid3.cot") == b"<event>2</event>"
+
+
+def test_tar_entries_are_stamped(tmp_path):
+    path = str(tmp_path / "out.tar")
+    list(cot_generator._save_to_archive(iter(CONVERTED), path))
+    with tarfile.open(path) as archive:
+        members = archive.getmembers()
+        assert [member.name for member in members] == ["uid1.cot", "uid3.cot"]
+        assert all(member.mtime > 0 and member.mode == 0o644 for member in members)
+        assert archive.extractfile("uid1.cot").read() == b"<event/>"
+
+
+def test_style_map_resolves_normal_pair():
+    document = kml("""
+        <Style id="red"><LineStyle><color>ff0000ff</color><width>2</width></LineStyle></Style>
+        <StyleMap id="map">
+            <Pair><key>highlight</key><styleUrl>#other</styleUrl></Pair>
+            <Pair><key>normal</key><styleUrl>#red</styleUrl></Pair>
+        </StyleMap>
+        <Placemark><styleUrl>#map</styleUrl></Placemark>""")
+    style_cache = cot_generator.parse_styles(style_table(document))
+    placemark = document[-1]
+    assert cot_generator.extract_style_info(placemark, style_cache) == {"stroke_color": "-65536", "stroke_weight": "2"}
+
+
+def test_unresolved_style_map_falls_back_to_inline_style():
+    document = kml("""
+        <StyleMap id="map"><Pair><key>normal</key><styleUrl>#missing</styleUrl></Pair></StyleMap>
+        <Placemark><styleUrl>#map</styleUrl><Style><PolyStyle><color>ff00ff00</color></PolyStyle></Style></Placemark>""")
+    style_cache = cot_generator.parse_styles(style_table(document))
+    assert "map" not in style_cache
+    placemark = document[-1]
+    assert cot_generator.extract_style_info(placemark, style_cache) == {"fill_color": "-16711936"}
+
+
+def test_colors_are_signed_argb():
+    assert cot_generator.convert_kml_color_to_cot("ff0000ff") == "-65536"
+    assert cot_generator.convert_kml_color_to_cot("ffff0000") == "-16776961"
+    assert cot_generator.convert_kml_color_to_cot("7f0000ff") == str(0x7FFF0000)
+    assert cot_generator.convert_kml_color_to_cot("+f0000ff") == "-16777216"
+
+
+def test_callsign_is_escaped():
+    cot_xml = cot_generator.create_cot_point("A & 'B' <C>", [(1.0, 2.0, 0.0)], "test")
+    event = etree.fromstring(cot_xml)
+    assert event.find("detail/contact").get("callsign") == "A & 'B' <C>"
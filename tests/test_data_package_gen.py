@@ -0,0 +1,34 @@
+import json
+import os
+
+import data_package_gen
+from CoT_Converter import cot_generator
+
+
+def test_index_round_trip(tmp_path):
+    output_dir = str(tmp_path)
+    converted = [(b"<event><contact callsign='Scanned'/></event>", "uid1", "Indexed & Named"),
+                 (None, "uid2", "Skipped")]
+    list(cot_generator._save_to_directory(iter(converted), output_dir))
+
+    with open(os.path.join(output_dir, cot_generator.INDEX_FILENAME), encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [{"uid": "uid1", "callsign": "Indexed & Named"}]
+    # Listed files take their call sign from the index; others are scanned
+    with open(os.path.join(output_dir, "uid3.cot"), "wb") as f:
+        f.write(b"<event><contact callsign='A &amp; B'/></event>")
+    assert sorted(data_package_gen.collect_cot_files(output_dir)) == [("uid1", "Indexed & Named"), ("uid3", "A & B")]
+
+
+def test_index_is_rewritten_per_run(tmp_path):
+    output_dir = str(tmp_path)
+    for _ in range(2):
+        list(cot_generator._save_to_directory(iter([(b"<event/>", "uid1", "One")]), output_dir))
+    with open(os.path.join(output_dir, cot_generator.INDEX_FILENAME), encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+
+
+def test_empty_file_has_unknown_call_sign(tmp_path, capsys):
+    path = tmp_path / "empty.cot"
+    path.write_bytes(b"")
+    assert data_package_gen.extract_call_sign(str(path)) == "Unknown"
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,37 @@
+import pytest
+
+from CoT_Converter.kml_parser import calculate_centroid, parse_coordinate_text
+
+
+def test_parse_3d_coordinates():
+    assert parse_coordinate_text('1,2,3 4,5,6') == [(2.0, 1.0, 3.0), (5.0, 4.0, 6.0)]
+
+
+def test_parse_2d_coordinates():
+    assert parse_coordinate_text('1,2\n 3,4') == [(2.0, 1.0, 0.0), (4.0, 3.0, 0.0)]
+
+
+def test_parse_mixed_coordinates():
+    assert parse_coordinate_text('1,2,3 4,5') == [(2.0, 1.0, 3.0), (5.0, 4.0, 0.0)]
+
+
+def test_skip_single_component_tuple():
+    assert parse_coordinate_text('1,2,3 4') == [(2.0, 1.0, 3.0)]
+
+
+def test_extra_components_are_ignored():
+    assert parse_coordinate_text('1,2,3,4 5,6') == [(2.0, 1.0, 3.0), (6.0, 5.0, 0.0)]
+
+
+def test_empty_text():
+    assert parse_coordinate_text('  ') == []
+
+
+def test_non_numeric_component():
+    with pytest.raises(ValueError):
+        parse_coordinate_text('1,a,3')
+
+
+def test_centroid():
+    assert calculate_centroid([(1.0, 2.0, 3.0), (3.0, 6.0, 5.0)]) == (2.0, 4.0, 4.0)
+    assert calculate_centroid([]) is None
@@ -0,0 +1,10 @@
+from CoT_Converter import kml_parser, kml_splitter
+
+
+def test_amp_pattern_matches_parser():
+    assert kml_splitter.UNESCAPED_AMP_RE.pattern == kml_parser._AMP_FIX.pattern
+
+
+def test_character_references_are_kept():
+    content = b'A & B &amp; &#38; &#x26; &nbsp'
+    assert kml_splitter.UNESCAPED_AMP_RE.sub(b'&amp;', content) == b'A &amp; B &amp; &#38; &#x26; &amp;nbsp'